@@ -0,0 +1,243 @@
+import glob
+import os
+import sqlite3
+from typing import List, Set, Tuple
+
+import yaml
+
+import config
+import timestamps
+
+
+try:
+    with open('archive.yaml', 'r') as f:
+        CONF = yaml.safe_load(f) or {}
+except FileNotFoundError:
+    CONF = {}
+
+# Events older than this many days are archived; None to never archive.
+HORIZON_DAYS = CONF.get('HORIZON_DAYS')
+# 'single' for one archive file; 'yearly' for one archive file per year
+MODE = CONF.get('MODE', 'single')
+PATH = CONF.get(
+    'PATH', 'archive-{year}.db' if MODE == 'yearly' else 'archive.db'
+    )
+# Days between VACUUM/ANALYZE runs
+COMPACT_DAYS = CONF.get('COMPACT_DAYS', 7)
+
+
+def get_archive_paths() -> List[str]:
+    """Get existing archive files.
+
+    Returns:
+        List[str]: archive file paths
+
+    """
+    if MODE != 'yearly':
+        return [PATH] if os.path.exists(PATH) else []
+    return sorted(glob.glob(PATH.format(year='[0-9]' * 4)))
+
+
+def get_attached() -> Set[str]:
+    """Get the schema names of attached databases, excluding the live
+    database.
+
+    Returns:
+        Set[str]: names of attached databases
+
+    """
+    return {
+        name for _, name, _ in config.DB.execute('PRAGMA database_list')
+        if name not in ('main', 'temp')
+        }
+
+
+def attach(schema: str, path: str) -> bool:
+    """Attach an archive database, creating it if necessary. Archives
+    are attached only while in use; see `detach()`.
+
+    Args:
+        schema (str): the name to attach the archive as
+        path (str): the archive file
+
+    Returns:
+        bool: whether the archive is attached
+
+    """
+    if schema in get_attached():
+        return True
+    # ATTACH cannot run inside a transaction.
+    config.DB.commit()
+    try:
+        config.DB.execute('ATTACH DATABASE ? AS {0}'.format(schema), (path,))
+    except sqlite3.OperationalError as e:
+        # e.g. too many attached databases (SQLite's default limit is 10)
+        config.LOGGER.warning(f'Could not attach {path}: {e}')
+        return False
+    config.DB.execute(
+        'CREATE TABLE IF NOT EXISTS {0}.UQ {1}'.format(
+            schema, config.SCHEMA['UQ']
+            )
+        )
+    config.DB.commit()
+    return True
+
+
+def detach(schema: str) -> None:
+    """Detach an archive database.
+
+    Args:
+        schema (str): the name the archive was attached as
+
+    """
+    config.DB.commit()
+    config.DB.execute('DETACH DATABASE {0}'.format(schema))
+
+
+def get_history() -> List[Tuple[str, str, str, str, int]]:
+    """Get all events from the live table and every archive. Archives
+    are read one at a time through their own connections, so any
+    number of archives can be read.
+
+    Returns:
+        List[Tuple[str, str, str, str, int]]: (DATE, NAME, TITLE, URL,
+            EPOCH) of every event, oldest first
+
+    """
+    query = 'SELECT DATE, NAME, TITLE, URL, EPOCH FROM UQ'
+    rows = config.DB.execute(query).fetchall()
+    for path in get_archive_paths():
+        db = sqlite3.Connection(path)
+        try:
+            rows.extend(db.execute(query))
+        finally:
+            db.close()
+    return sorted(rows, key=lambda row: row[4])
+
+
+def get_archived_schedules() -> Set[Tuple[str, str]]:
+    """Get schedules that have records in any archive.
+
+    Returns:
+        Set[Tuple[str, str]]: (title, URL) of each archived schedule
+
+    """
+    return set(config.DB.execute('SELECT TITLE, URL FROM ARCHIVED'))
+
+
+def get_schema(dt_str: str) -> str:
+    """Get the archive an event belongs to.
+
+    Args:
+        dt_str (str): the event's datetime string
+
+    Returns:
+        str: the schema name of the archive
+
+    """
+    if MODE == 'yearly':
+        return f'archive_{dt_str[:4]}'
+    return 'archive'
+
+
+def get_path(schema: str) -> str:
+    """Get the file of an archive.
+
+    Args:
+        schema (str): the schema name of the archive
+
+    Returns:
+        str: the archive file path
+
+    """
+    if MODE == 'yearly':
+        return PATH.format(year=schema.split('_')[1])
+    return PATH
+
+
+def rotate() -> None:
+    """Move events older than the horizon from the live table into
+    the archives.
+
+    """
+    if HORIZON_DAYS is None:
+        config.LOGGER.debug('No retention horizon configured; skipped.')
+        return
+    cutoff = timestamps.to_epoch(config.NOW) - HORIZON_DAYS * 24 * 60 * 60
+    rows = config.DB.execute(
+        'SELECT DATE, NAME, TITLE, URL, EPOCH FROM main.UQ WHERE EPOCH < ?',
+        (cutoff,)
+        ).fetchall()
+    if not rows:
+        return
+
+    targets = {}
+    for row in rows:
+        targets.setdefault(get_schema(row[0]), []).append(row)
+
+    archived = 0
+    # Only one archive is attached at a time, so there is no limit on
+    # the number of archives.
+    for schema, records in targets.items():
+        if not attach(schema, get_path(schema)):
+            config.LOGGER.error(f'Archiving into {schema} was aborted.')
+            continue
+        try:
+            # Attached databases share one transaction, so a failure
+            # here leaves records in exactly one place.
+            config.DB.executemany(
+                f'INSERT OR IGNORE INTO {schema}.UQ '
+                '(DATE, NAME, TITLE, URL, EPOCH) VALUES (?, ?, ?, ?, ?)',
+                records
+                )
+            config.DB.executemany(
+                'DELETE FROM main.UQ WHERE DATE = ?',
+                [(dt_str,) for dt_str, _, _, _, _ in records]
+                )
+            config.DB.executemany(
+                'INSERT OR IGNORE INTO ARCHIVED VALUES (?, ?)',
+                {(title, url) for _, _, title, url, _ in records}
+                )
+            config.DB.commit()
+            archived += len(records)
+        except sqlite3.Error as e:
+            config.DB.rollback()
+            config.LOGGER.error(f'Archiving into {schema} failed: {e}')
+        finally:
+            detach(schema)
+    config.LOGGER.info(f'Archived {archived} records.')
+
+
+def compact() -> None:
+    """Run VACUUM and ANALYZE on the live database and archives, at
+    most once every `COMPACT_DAYS` days.
+
+    """
+    now = timestamps.to_epoch(config.NOW)
+    row = config.DB.execute(
+        "SELECT VALUE FROM META WHERE KEY = 'LAST_COMPACTION'"
+        ).fetchone()
+    if row and now - int(row[0]) < COMPACT_DAYS * 24 * 60 * 60:
+        return
+
+    config.DB.commit()
+    config.DB.execute('VACUUM')
+    config.DB.execute('ANALYZE')
+    for path in get_archive_paths():
+        db = sqlite3.Connection(path)
+        try:
+            db.execute('VACUUM')
+            db.execute('ANALYZE')
+        finally:
+            db.close()
+    config.DB.execute(
+        'INSERT OR REPLACE INTO META VALUES (?, ?)',
+        ('LAST_COMPACTION', str(now))
+        )
+    config.DB.commit()
+    config.LOGGER.info('Compacted databases.')
+
+
+if __name__ == '__main__':
+    rotate()
+    compact()
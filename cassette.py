@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep
+from typing import Dict, Tuple
+
+import requests
+import yaml
+
+import config
+
+
+# Modes: 'live' (default), 'record', 'replay'
+try:
+    with open('cassette.yaml', 'r') as f:
+        CONF = yaml.safe_load(f) or {}
+except FileNotFoundError:
+    CONF = {}
+
+MODE = CONF.get('MODE', 'live')
+DIRECTORY = CONF.get('DIRECTORY', 'cassettes')
+HOST = CONF.get('HOST', '127.0.0.1')
+PORT = CONF.get('PORT', 0)
+# Seconds added to every replayed response
+LATENCY = CONF.get('LATENCY', 0)
+# Chance (0 to 1) of a replayed response being replaced by ERROR_STATUS
+ERROR_RATE = CONF.get('ERROR_RATE', 0)
+ERROR_STATUS = CONF.get('ERROR_STATUS', 503)
+SEED = CONF.get('SEED', 0)
+# Seconds between schedule fetches in `uq.MainPage.parse()`
+CRAWL_DELAY = CONF.get('CRAWL_DELAY', 10)
+
+if MODE not in ('live', 'record', 'replay'):
+    config.LOGGER.warning(f'Unknown cassette mode "{MODE}"; using "live".')
+    MODE = 'live'
+
+# Stand-in server for replay; started on first use
+SERVER = None
+
+
+def get_key(url: str) -> str:
+    """Get the cassette key of a URL.
+
+    Args:
+        url (str): the URL that was requested
+
+    Returns:
+        str: a file-safe key for the URL
+
+    """
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+
+def write_cassette(url: str, response: requests.Response) -> None:
+    """Record a response into the cassette directory.
+
+    Args:
+        url (str): the URL that was requested
+        response (requests.Response): the live response
+
+    """
+    os.makedirs(DIRECTORY, exist_ok=True)
+    key = get_key(url)
+    with open(os.path.join(DIRECTORY, f'{key}.html'), 'wb') as f:
+        f.write(response.content)
+    with open(os.path.join(DIRECTORY, f'{key}.json'), 'w') as f:
+        json.dump(
+            {
+                'url': url,
+                'status': response.status_code,
+                'content_type': response.headers.get(
+                    'Content-Type', 'text/html; charset=utf-8'
+                    ),
+                },
+            f,
+            indent=2,
+            )
+    config.LOGGER.info(f'Recorded {url} as {key}')
+
+
+def read_cassette(key: str) -> Tuple[int, Dict[str, str], bytes]:
+    """Read a recorded response from the cassette directory.
+
+    Args:
+        key (str): the cassette key; see `get_key()`
+
+    Returns:
+        Tuple[int, Dict[str, str], bytes]: (status, headers, body)
+
+    Raises:
+        FileNotFoundError: if the key was never recorded
+
+    """
+    with open(os.path.join(DIRECTORY, f'{key}.json'), 'r') as f:
+        meta = json.load(f)
+    with open(os.path.join(DIRECTORY, f'{key}.html'), 'rb') as f:
+        body = f.read()
+    return meta['status'], {'Content-Type': meta['content_type']}, body
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Serves recorded responses in place of pso2.com."""
+
+    rng = random.Random(SEED)
+    lock = threading.Lock()
+
+    def do_GET(self) -> None:
+        """Serve a cassette, after latency and possible error injection."""
+        with self.lock:
+            is_error = self.rng.random() < ERROR_RATE
+        if LATENCY:
+            sleep(LATENCY)
+        try:
+            status, headers, body = read_cassette(self.path.strip('/'))
+        except FileNotFoundError:
+            status, headers, body = 404, {}, b''
+        if is_error:
+            status, headers, body = ERROR_STATUS, {}, b''
+        self.send_response(status)
+        for header, value in headers.items():
+            self.send_header(header, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        """Log requests to the project logger instead of stderr."""
+        config.LOGGER.debug(f'Stand-in: {format % args}')
+
+
+def start_server() -> ThreadingHTTPServer:
+    """Start the stand-in server in a background thread, if it isn't
+    already running.
+
+    Returns:
+        ThreadingHTTPServer: the running stand-in server
+
+    """
+    global SERVER
+    if SERVER is None:
+        SERVER = ThreadingHTTPServer((HOST, PORT), StandIn)
+        thread = threading.Thread(target=SERVER.serve_forever, daemon=True)
+        thread.start()
+        config.LOGGER.info(
+            f'Replaying {DIRECTORY} @ '
+            f'http://{HOST}:{SERVER.server_address[1]}'
+            )
+    return SERVER
+
+
+def get(url: str) -> requests.Response:
+    """Fetch a URL through the configured transport. Used in place of
+    `requests.get()`.
+
+    Args:
+        url (str): the URL to fetch
+
+    Returns:
+        requests.Response: the response, live or replayed
+
+    Raises:
+        requests.HTTPError: if the response is an error, including
+            injected errors and pages that were never recorded
+
+    """
+    if MODE == 'replay':
+        port = start_server().server_address[1]
+        response = requests.get(f'http://{HOST}:{port}/{get_key(url)}')
+    else:
+        response = requests.get(url)
+        if MODE == 'record':
+            write_cassette(url, response)
+    response.raise_for_status()
+    return response
+
+
+def crawl_delay() -> None:
+    """Wait between fetching schedules."""
+    sleep(CRAWL_DELAY)
+
+
+if __name__ == '__main__':
+    server = ThreadingHTTPServer((HOST, PORT or 8080), StandIn)
+    config.LOGGER.info(
+        f'Replaying {DIRECTORY} @ http://{HOST}:{server.server_address[1]}'
+        )
+    server.serve_forever()
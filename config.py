@@ -1,10 +1,12 @@
 import logging
 import logging.handlers
 import sqlite3
+from datetime import date, datetime
 
-import pendulum
 import yaml
 
+import timestamps
+
 
 LOGGER = logging.getLogger('pso2_news')
 LOGGER.setLevel(logging.DEBUG)
@@ -33,24 +35,50 @@ CH.setFormatter(
 LOGGER.addHandler(FH)
 LOGGER.addHandler(CH)
 
-TODAY = pendulum.today()
-NOW = pendulum.now()
+TODAY = date.today()
+NOW = datetime.now().astimezone()
 
 
 DB = sqlite3.Connection('news.db')
 CURSOR = DB.cursor()
 
 SCHEMA = {
-    'UQ': '(DATE TEXT UNIQUE, NAME TEXT, TITLE TEXT, URL TEXT)'
+    'UQ': (
+        '(DATE TEXT UNIQUE, NAME TEXT, TITLE TEXT, URL TEXT, EPOCH INTEGER)'
+        ),
+    'META': '(KEY TEXT UNIQUE, VALUE TEXT)',
+    'ARCHIVED': '(TITLE TEXT, URL TEXT, UNIQUE (TITLE, URL))',
+    'COLORS': (
+        '(COLOR TEXT, PALETTE TEXT, IS_UQ INTEGER, NAME TEXT, '
+        'UNIQUE (COLOR, PALETTE, IS_UQ))'
+        ),
     }
 
 for table, schema in SCHEMA.items():
     CURSOR.execute('CREATE TABLE IF NOT EXISTS {0} {1}'.format(table, schema))
     DB.commit()
 
+# Databases created before EPOCH was added need it filled in from DATE.
+CURSOR.execute('PRAGMA table_info(UQ)')
+if 'EPOCH' not in [column[1] for column in CURSOR.fetchall()]:
+    LOGGER.info('Adding EPOCH to existing UQ records...')
+    CURSOR.execute('ALTER TABLE UQ ADD COLUMN EPOCH INTEGER')
+    CURSOR.execute('SELECT DATE FROM UQ')
+    CURSOR.executemany(
+        'UPDATE UQ SET EPOCH = ? WHERE DATE = ?',
+        [(timestamps.parse_epoch(dt_str), dt_str) for dt_str, in CURSOR]
+        )
+    DB.commit()
+
+CURSOR.execute('CREATE INDEX IF NOT EXISTS UQ_EPOCH ON UQ (EPOCH)')
+DB.commit()
+
 
-CURSOR.execute('SELECT * FROM UQ')
-RESULTS = sorted(CURSOR.fetchall(), reverse=True)
+# Newest first; compare EPOCH, not DATE, as DATE strings differ in offset.
+CURSOR.execute(
+    'SELECT DATE, NAME, TITLE, URL, EPOCH FROM UQ ORDER BY EPOCH DESC'
+    )
+RESULTS = CURSOR.fetchall()
 
 
 try:
@@ -0,0 +1,296 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+from typing import Dict, List, Union
+
+import yaml
+
+import archive
+import config
+import timestamps
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+try:
+    with open('export.yaml', 'r') as f:
+        CONF = yaml.safe_load(f) or {}
+except FileNotFoundError:
+    CONF = {}
+
+# Shards are only written if a directory is configured.
+DIRECTORY = CONF.get('DIRECTORY')
+# Any of 'gzip' and 'brotli'
+COMPRESS = CONF.get('COMPRESS', [])
+# Number of events in the "upcoming" shard
+UPCOMING = CONF.get('UPCOMING', 10)
+# Hours to keep shards after they stop being current, for readers
+# with an older index.json
+GRACE_HOURS = CONF.get('GRACE_HOURS', 24)
+
+MANIFEST = 'index.json'
+# Shards no longer in the manifest, and when they were superseded
+STALE = 'stale.json'
+
+SLUG = re.compile(r'[^a-z0-9]+')
+
+
+def slugify(name: str) -> str:
+    """Convert a UQ name into a file-safe key.
+
+    Args:
+        name (str): name of the UQ
+
+    Returns:
+        str: a key like "urgent-quest-the-manifested-planetbreaker"
+
+    """
+    return SLUG.sub('-', name.lower()).strip('-')
+
+
+def get_quest_key(name: str, slugs: Dict[str, str]) -> str:
+    """Get a UQ's shard key, which is unique to its name.
+
+    Args:
+        name (str): name of the UQ
+        slugs (Dict[str, str]): a dictionary mapping slugs already in
+            use to their UQ names; updated with the new slug
+
+    Returns:
+        str: a key like "quest/urgent-quest-the-manifested-planetbreaker"
+
+    """
+    slug = slugify(name)
+    digest = hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]
+    if not slug:
+        slug = digest
+    elif slugs.get(slug, name) != name:
+        # Another UQ already has this slug; e.g. names differing by case
+        slug = f'{slug}-{digest}'
+    slugs[slug] = name
+    return f'quest/{slug}'
+
+
+def dump(data: Union[Dict, List]) -> bytes:
+    """Serialize data the same way every time, so unchanged data
+    hashes the same.
+
+    Args:
+        data (Union[Dict, List]): the data to serialize
+
+    Returns:
+        bytes: UTF-8 encoded JSON
+
+    """
+    return json.dumps(
+        data, ensure_ascii=False, separators=(',', ':'), sort_keys=True
+        ).encode('utf-8')
+
+
+def get_events() -> List[Dict[str, Union[str, int]]]:
+    """Get all events from the database, including archives, oldest
+    first.
+
+    Returns:
+        List[Dict[str, Union[str, int]]]: a list of events
+
+    """
+    return [
+        {'date': dt_str, 'name': uq, 'title': title, 'url': url, 'epoch': epoch}
+        for dt_str, uq, title, url, epoch in archive.get_history()
+        ]
+
+
+def build_shards(events: List[Dict]) -> Dict[str, List[Dict]]:
+    """Split events into shards: per month, per UQ, and upcoming.
+
+    Args:
+        events (List[Dict]): events from `get_events()`
+
+    Returns:
+        Dict[str, List[Dict]]: a dictionary mapping shard keys (e.g.
+            "month/2020-06") to their events
+
+    """
+    now = timestamps.to_epoch(config.NOW)
+    shards = {'upcoming': []}
+    # slug: UQ name
+    slugs = {}
+    # UQ name: shard key
+    quests = {}
+    for event in events:
+        # The month of the schedule's own timezone, not UTC
+        month = event['date'][:7]
+        shards.setdefault(f'month/{month}', []).append(event)
+        name = event['name']
+        if name not in quests:
+            quests[name] = get_quest_key(name, slugs)
+        shards.setdefault(quests[name], []).append(event)
+        if event['epoch'] >= now and len(shards['upcoming']) < UPCOMING:
+            shards['upcoming'].append(event)
+    return shards
+
+
+def write_file(path: str, body: bytes) -> None:
+    """Write a file so readers never see a partial file.
+
+    Args:
+        path (str): the destination path
+        body (bytes): the file contents
+
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp = f'{path}.tmp'
+    with open(temp, 'wb') as f:
+        f.write(body)
+    os.replace(temp, path)
+
+
+def get_siblings(name: str) -> List[str]:
+    """Get a shard's file name and any compressed file names.
+
+    Args:
+        name (str): the shard's file name
+
+    Returns:
+        List[str]: file names for the shard
+
+    """
+    names = [name]
+    if 'gzip' in COMPRESS:
+        names.append(f'{name}.gz')
+    if 'brotli' in COMPRESS and brotli:
+        names.append(f'{name}.br')
+    return names
+
+
+def compress(name: str, body: bytes) -> bytes:
+    """Compress a shard for one of its siblings.
+
+    Args:
+        name (str): the sibling's file name, ending in ".gz" or ".br"
+        body (bytes): the serialized shard
+
+    Returns:
+        bytes: the compressed shard
+
+    """
+    if name.endswith('.br'):
+        return brotli.compress(body)
+    buffer = io.BytesIO()
+    # mtime is fixed so identical shards compress identically
+    with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as gz:
+        gz.write(body)
+    return buffer.getvalue()
+
+
+def write_shard(key: str, body: bytes) -> str:
+    """Write a shard under a content-hashed name, along with any
+    compressed siblings; files that already exist are not rewritten.
+
+    Args:
+        key (str): the shard key, e.g. "month/2020-06"
+        body (bytes): the serialized shard
+
+    Returns:
+        str: the shard's file name, relative to `DIRECTORY`
+
+    """
+    digest = hashlib.sha256(body).hexdigest()[:16]
+    name = f'{key}.{digest}.json'
+    for sibling in get_siblings(name):
+        path = os.path.join(DIRECTORY, sibling)
+        if os.path.exists(path):
+            continue
+        if sibling == name:
+            write_file(path, body)
+        else:
+            write_file(path, compress(sibling, body))
+        config.LOGGER.info(f'Wrote shard {sibling}')
+    return name
+
+
+def remove_stale(old: Dict[str, str], new: Dict[str, str]) -> int:
+    """Track shards that are no longer current, and remove those that
+    have not been current for `GRACE_HOURS`.
+
+    Args:
+        old (Dict[str, str]): the previous manifest
+        new (Dict[str, str]): the current manifest
+
+    Returns:
+        int: the number of shards removed
+
+    """
+    stale_path = os.path.join(DIRECTORY, STALE)
+    try:
+        with open(stale_path, 'r') as f:
+            stale = json.load(f)
+    except (FileNotFoundError, ValueError):
+        stale = {}
+
+    now = timestamps.to_epoch(config.NOW)
+    current = set(new.values())
+    for name in set(old.values()) - current:
+        stale.setdefault(name, now)
+    removed = 0
+    for name, superseded in list(stale.items()):
+        # A shard can become current again if its events change back.
+        if name in current:
+            del stale[name]
+        elif now - superseded >= GRACE_HOURS * 60 * 60:
+            # Whatever COMPRESS was when the shard was written
+            for sibling in [name, f'{name}.gz', f'{name}.br']:
+                try:
+                    os.remove(os.path.join(DIRECTORY, sibling))
+                except FileNotFoundError:
+                    continue
+            del stale[name]
+            removed += 1
+    write_file(stale_path, dump(stale))
+    return removed
+
+
+def write_shards() -> None:
+    """Export the database into static JSON shards. Only shards whose
+    events changed are written; `index.json` points to the current
+    file of every shard. Shards that are no longer current are kept
+    for `GRACE_HOURS` before removal.
+
+    """
+    if not DIRECTORY:
+        config.LOGGER.debug('No export directory configured; skipped.')
+        return
+    if 'brotli' in COMPRESS and not brotli:
+        config.LOGGER.warning(
+            'brotli compression requires the "brotli" package; skipped.'
+            )
+
+    manifest_path = os.path.join(DIRECTORY, MANIFEST)
+    try:
+        with open(manifest_path, 'r') as f:
+            old = json.load(f)
+    except (FileNotFoundError, ValueError):
+        old = {}
+
+    shards = build_shards(get_events())
+    new = {key: write_shard(key, dump(events)) for key, events in shards.items()}
+    if new == old:
+        config.LOGGER.info('No shards changed.')
+    else:
+        write_file(manifest_path, dump(new))
+        config.LOGGER.info(f'Exported {len(new)} shards.')
+
+    removed = remove_stale(old, new)
+    if removed:
+        config.LOGGER.info(f'Removed {removed} stale shards.')
+
+
+if __name__ == '__main__':
+    write_shards()
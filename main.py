@@ -1,10 +1,15 @@
 import yaml
 
+import archive
 import config
+import export
 import uq
 
 
 if __name__ == '__main__':
     mp = uq.MainPage()
     mp.parse()
+    archive.rotate()
+    archive.compact()
+    export.write_shards()
     config.write_main()
@@ -1,9 +1,9 @@
 from datetime import timedelta
 
-import pendulum
 from feedgen.feed import FeedGenerator
 
 import config
+import timestamps
 
 
 AUTHOR = {'name': 'SEGA'}
@@ -14,7 +14,7 @@ class UQRSS:
     """RSS feed for Urgent Quests."""
 
     PRIOR_MINS = timedelta(minutes=30)
-    EVENT_TIME = str(config.NOW + PRIOR_MINS)
+    EVENT_TIME = timestamps.to_epoch(config.NOW + PRIOR_MINS)
 
     def __init__(self) -> None:
         """Initialize the RSS generation first by initializing feedgen."""
@@ -34,11 +34,13 @@ class UQRSS:
 
     def generate_feed(self) -> None:
         """Generate a feed by going through the database."""
-        config.CURSOR.execute('SELECT * FROM UQ')
-        results = sorted(config.CURSOR.fetchall(), reverse=True)
+        config.CURSOR.execute(
+            'SELECT DATE, NAME, TITLE, URL, EPOCH FROM UQ ORDER BY EPOCH DESC'
+            )
+        results = config.CURSOR.fetchall()
         start = 0
-        for n, (dt_str, uq, title, url) in enumerate(results):
-            if dt_str > self.EVENT_TIME:
+        for n, (dt_str, uq, title, url, epoch) in enumerate(results):
+            if epoch > self.EVENT_TIME:
                 continue
             elif start == 0:
                 start = n
@@ -50,7 +52,7 @@ class UQRSS:
             #entry.description(uq)
             entry.link(href=url)
             entry.guid(f'{dt_str}/{uq}')
-            entry.pubDate(pendulum.parse(dt_str))
+            entry.pubDate(timestamps.to_datetime(epoch, dt_str))
 
     def write_feed(self) -> None:
         """Write out the feed after generating entries."""
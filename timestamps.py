@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta, timezone, tzinfo
+from functools import lru_cache
+
+from dateutil import tz
+
+
+def to_epoch(dt: datetime) -> int:
+    """Convert a timezone-aware datetime to seconds since the epoch.
+
+    Args:
+        dt (datetime): a timezone-aware datetime; pendulum datetimes
+            are also accepted
+
+    Returns:
+        int: seconds since the epoch
+
+    """
+    return int(dt.timestamp())
+
+
+def parse_epoch(dt_str: str) -> int:
+    """Convert a datetime string from the database to seconds since
+    the epoch.
+
+    Args:
+        dt_str (str): an ISO 8601 datetime like "2020-06-10T12:00:00-07:00"
+
+    Returns:
+        int: seconds since the epoch
+
+    """
+    return to_epoch(datetime.fromisoformat(dt_str))
+
+
+@lru_cache(maxsize=None)
+def get_timezone(offset: str) -> timezone:
+    """Get a fixed-offset timezone. Only a handful of offsets are ever
+    used, so these are cached.
+
+    Args:
+        offset (str): a UTC offset like "-07:00"
+
+    Returns:
+        timezone: the timezone for the offset
+
+    """
+    hours, minutes = [int(n) for n in offset[1:].split(':')]
+    delta = timedelta(hours=hours, minutes=minutes)
+    if offset.startswith('-'):
+        delta = -delta
+    return timezone(delta)
+
+
+@lru_cache(maxsize=None)
+def get_zone(name: str) -> tzinfo:
+    """Get a timezone by name, like "America/New_York".
+
+    Args:
+        name (str): an IANA timezone name
+
+    Returns:
+        tzinfo: the timezone
+
+    Raises:
+        ValueError: if the timezone doesn't exist
+
+    """
+    zone = tz.gettz(name)
+    if zone is None:
+        raise ValueError(f'Unknown timezone: {name}')
+    return zone
+
+
+def to_datetime(epoch: int, dt_str: str) -> datetime:
+    """Build a timezone-aware datetime for a database row. Only call
+    this for rows that will actually be used.
+
+    Args:
+        epoch (int): seconds since the epoch
+        dt_str (str): the row's datetime string; only its UTC offset
+            (e.g. "-07:00") is read
+
+    Returns:
+        datetime: the datetime in the row's original timezone
+
+    """
+    return datetime.fromtimestamp(epoch, get_timezone(dt_str[-6:]))
+
+
+def to_day_datetime_string(dt: datetime) -> str:
+    """Format a datetime like "Wed, Jun 10, 2020 12:00 PM". Matches
+    `pendulum.DateTime.to_day_datetime_string()`.
+
+    Args:
+        dt (datetime): the datetime to format
+
+    Returns:
+        str: the formatted datetime
+
+    """
+    hour = dt.hour % 12 or 12
+    ampm = 'AM' if dt.hour < 12 else 'PM'
+    return f'{dt:%a, %b} {dt.day}, {dt.year} {hour}:{dt:%M} {ampm}'
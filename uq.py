@@ -1,3 +1,4 @@
+import hashlib
 import re
 import sqlite3
 from datetime import timedelta
@@ -10,7 +11,10 @@ import requests
 from bs4 import BeautifulSoup, Tag
 from more_itertools import grouper
 
+import archive
+import cassette
 import config
+import timestamps
 
 
 EXAMPLE_MAIN = 'example-urgent_quests.html'
@@ -41,9 +45,6 @@ NOT_UQ = [
     "Server Shutdown (End of the Closed Beta Test)",
     ]
 
-# hex string: tuple of int
-KEY_COLORS = {}
-
 
 def parse_date(month: int, day: int) -> Tuple[int, int, int]:
     """Parse a date given month and day only and convert to
@@ -183,12 +184,16 @@ def get_uq_from_cell(cell: Tag, colors: Dict[str, str]) -> str:
                 raise MismatchedColor(color)
 
 
-def get_hex_color_from_cell(cell: Tag) -> str:
+def get_hex_color_from_cell(
+    cell: Tag, key_colors: Dict[str, Tuple[int, int, int]]
+    ) -> str:
     """Get a HEX color from the cell background, or if the background
     color is "red", just "red".
 
     Args:
         cell (Tag): a <td> element containing only a color
+        key_colors (Dict[str, Tuple[int, int, int]]): a dictionary
+            mapping hex colors to RGB; new colors are added here
 
     Returns:
         str: a hex format string representing a color
@@ -205,24 +210,28 @@ def get_hex_color_from_cell(cell: Tag) -> str:
                 rgb = '#' + ''.join(
                     [hex(n)[2:] for n in rgb_int]
                     ).upper()
-                if rgb not in KEY_COLORS:
-                    KEY_COLORS[rgb] = rgb_int
+                if rgb not in key_colors:
+                    key_colors[rgb] = rgb_int
                 return rgb
             else:
                 # This is horrifying. Hard-coded colors.
                 color = value.strip()
                 if color == 'black':
                     color = '#000000'
-                    if color not in KEY_COLORS:
-                        KEY_COLORS[color] = (0, 0, 0)
+                    if color not in key_colors:
+                        key_colors[color] = (0, 0, 0)
                 return color
 
 
-def get_colors_from_key(table: Tag) -> Dict[str, str]:
+def get_colors_from_key(
+    table: Tag, key_colors: Dict[str, Tuple[int, int, int]]
+    ) -> Dict[str, str]:
     """Map a color from RGB to HEX to its UQ.
 
     Args:
         table (Tag): represents a HTML table of a color key
+        key_colors (Dict[str, Tuple[int, int, int]]): a dictionary
+            mapping hex colors to RGB; see `get_hex_color_from_cell()`
 
     Returns:
         Dict[str, str]: a dictionary mapping colors to UQs
@@ -231,14 +240,33 @@ def get_colors_from_key(table: Tag) -> Dict[str, str]:
     colors = {}
     for row in table.find_all('tr'):
         col_color, col_uq = row.find_all('td')
-        color = get_hex_color_from_cell(col_color)
+        color = get_hex_color_from_cell(col_color, key_colors)
         colors[color] = col_uq.text.replace('\xa0', ' ')
 
     return colors
 
 
+def get_palette(colors: Dict[str, str]) -> str:
+    """Fingerprint a color key, so that colors resolved against it
+    can be reused for the same key on other pages.
+
+    Args:
+        colors (Dict[str, str]): a dictionary mapping colors from a key
+            to UQs
+
+    Returns:
+        str: a hash of the color key
+
+    """
+    key = '\n'.join(f'{color}={uq}' for color, uq in sorted(colors.items()))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
 def get_closest_color(
-    color: str, colors: Dict[str, str], is_uq: bool = True
+    color: str,
+    colors: Dict[str, str],
+    key_colors: Dict[str, Tuple[int, int, int]],
+    is_uq: bool = True,
     ) -> Union[str, None]:
     """Get the closest color representation. Only works for hex colors.
 
@@ -259,6 +287,8 @@ def get_closest_color(
         color (str): a color representation; should be in hex
         colors (Dict[str, str]): a dictionary mapping colors from a key
             to UQs; cells must either match a color here or be ignored
+        key_colors (Dict[str, Tuple[int, int, int]]): a dictionary
+            mapping hex colors to RGB; must include every color in `colors`
         is_uq (bool, optional): whether to limit to UQs xor concerts;
             defaults to True
 
@@ -288,7 +318,7 @@ def get_closest_color(
         if uq.startswith('Urgent Quest:') ^ is_uq:
             continue
         # Get Euclidean distance of the colors; using square value
-        d = sum([(c1 - c2)**2 for c1, c2 in zip(rgb_int, KEY_COLORS[c])])
+        d = sum([(c1 - c2)**2 for c1, c2 in zip(rgb_int, key_colors[c])])
         if d < distance:
             distance = d
             closest = uq
@@ -302,6 +332,88 @@ class MismatchedColor(ValueError):
         self.color = color
 
 
+class ColorContext:
+    """Color state for a single schedule. Colors from one schedule's
+    key never affect another schedule.
+
+    Colors that don't match the key exactly are resolved with
+    `get_closest_color()`. Resolutions are kept in the DB by color key
+    (see `get_palette()`), so later runs can skip the search.
+
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty color context."""
+        # hex string: tuple of int
+        self.key_colors = {}
+        self.colors = {}
+        self.palette = None
+        # (color, palette, is_uq): UQ
+        self.resolved = {}
+        # Resolutions not yet in the DB
+        self.learned = {}
+        self.loaded = set()
+
+    def read_key(self, table: Tag) -> Dict[str, str]:
+        """Read a color key, and load past resolutions for it.
+
+        Args:
+            table (Tag): represents a HTML table of a color key
+
+        Returns:
+            Dict[str, str]: a dictionary mapping colors to UQs
+
+        """
+        self.colors = get_colors_from_key(table, self.key_colors)
+        self.palette = get_palette(self.colors)
+        if self.palette not in self.loaded:
+            self.loaded.add(self.palette)
+            for color, is_uq, uq in config.DB.execute(
+                'SELECT COLOR, IS_UQ, NAME FROM COLORS WHERE PALETTE = ?',
+                (self.palette,)
+                ):
+                self.resolved[(color, self.palette, bool(is_uq))] = uq
+        return self.colors
+
+    def get_closest_color(
+        self, color: str, is_uq: bool = True
+        ) -> Union[str, None]:
+        """Get the closest color in the current key; see
+        `get_closest_color()`.
+
+        Args:
+            color (str): a color representation; should be in hex
+            is_uq (bool, optional): whether to limit to UQs xor concerts;
+                defaults to True
+
+        Returns:
+            str: if valid, the UQ name associated with a color
+            None: if no colors were matched; probably an empty cell
+
+        """
+        key = (color, self.palette, is_uq)
+        if key not in self.resolved:
+            self.resolved[key] = get_closest_color(
+                color, self.colors, self.key_colors, is_uq
+                )
+            # Only near-miss hex colors are worth keeping; anything else
+            # resolves to None without a search.
+            if color.startswith('#') and self.resolved[key] is not None:
+                self.learned[key] = self.resolved[key]
+        return self.resolved[key]
+
+    def write_to_db(self) -> None:
+        """Write new resolutions to DB. The caller must commit."""
+        config.CURSOR.executemany(
+            'INSERT OR IGNORE INTO COLORS VALUES (?, ?, ?, ?)',
+            [
+                (color, palette, is_uq, uq)
+                for (color, palette, is_uq), uq in self.learned.items()
+                ]
+            )
+        self.learned = {}
+
+
 class Schedule:
     """Represents a schedule page for Urgent Quests."""
 
@@ -323,7 +435,7 @@ class Schedule:
         self.is_url = is_url
         self.url = url_or_file
         if is_url:
-            page = requests.get(url_or_file)
+            page = cassette.get(url_or_file)
             self.soup = BeautifulSoup(page.text, 'html.parser')
         else:
             with open(f'example-urgent_quest-{schedule}.html', 'r') as example:
@@ -332,6 +444,7 @@ class Schedule:
     def parse(self) -> None:
         """Parse the page and convert into database entries."""
         self.schedule = {}
+        self.color_context = ColorContext()
         tables = self.soup.find('div', 'emergency cms')
         for table_a, table_b in grouper(tables.find_all('table'), 2):
             rows = table_a.find_all('tr')
@@ -358,7 +471,7 @@ class Schedule:
                         if PSDT.search(cell.text):
                             pacific = i
                 # Skip row 2 (days of the week) and row 3 ("Time (PDT)").
-                color_map = get_colors_from_key(table_b)
+                color_map = self.color_context.read_key(table_b)
                 for row in rows[3:]:
                     widths = 0
                     try:
@@ -385,7 +498,9 @@ class Schedule:
                                 is_uq = True
                             if e.color == 'black':
                                 e.color = '#000000'
-                            uq = get_closest_color(e.color, color_map, is_uq)
+                            uq = self.color_context.get_closest_color(
+                                e.color, is_uq
+                                )
 
                         if not uq:
                             continue
@@ -432,8 +547,12 @@ class Schedule:
         for date, uq in self.schedule.items():
             try:
                 config.CURSOR.execute(
-                    'INSERT INTO UQ VALUES (?, ?, ?, ?)',
-                    (str(date), uq, self.title, self.url)
+                    'INSERT INTO UQ (DATE, NAME, TITLE, URL, EPOCH) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (
+                        str(date), uq, self.title, self.url,
+                        timestamps.to_epoch(date),
+                        )
                     )
                 records_in += 1
             except sqlite3.IntegrityError:
@@ -443,6 +562,7 @@ class Schedule:
                 continue
 
         if self.is_url:
+            self.color_context.write_to_db()
             config.DB.commit()
             config.LOGGER.info(f'Wrote {records_in} records into database.')
         else:
@@ -465,8 +585,14 @@ class MainPage:
         config.LOGGER.info('Initializing UQ MainPage...')
         self.is_url = is_url
         if is_url:
-            page = requests.get(self.URL)
-            self.soup = BeautifulSoup(page.text, 'html.parser')
+            try:
+                page = cassette.get(self.URL)
+                self.soup = BeautifulSoup(page.text, 'html.parser')
+            except requests.RequestException as e:
+                # `parse()` will skip this run; nothing is deleted.
+                config.LOGGER.error(f'Could not fetch the main page: {e}')
+                config.LOGGER.error(f'- URL: {self.URL}')
+                self.soup = None
         else:
             with open(EXAMPLE_MAIN, 'r') as example:
                 self.soup = BeautifulSoup(example, 'html.parser')
@@ -474,10 +600,14 @@ class MainPage:
             self.schedules = {result[2]: result[3] for result in config.RESULTS}
         except TypeError:
             self.schedules = None
+        self.archived = archive.get_archived_schedules()
 
     def parse(self) -> None:
         """Parse the page to find individual schedules."""
         self.new_schedules = {}
+        if self.soup is None:
+            config.LOGGER.error('The main page was not fetched; skipped.')
+            return
         news = self.soup.find('div', 'all-news-section')
         for schedule in news.find_all('div', 'content'):
             title = schedule.find('h3', 'title').text
@@ -497,9 +627,19 @@ class MainPage:
                 config.LOGGER.info('Found a matching schedule; skipped.')
                 config.LOGGER.info(f'- Match title: {title}')
                 config.LOGGER.info(f'- Match URL:   {url}')
+            elif (title, url) in self.archived:
+                config.LOGGER.info('Found an archived schedule; skipped.')
+                config.LOGGER.info(f'- Match title: {title}')
+                config.LOGGER.info(f'- Match URL:   {url}')
             else:
-                sleep(10)
-                s = Schedule(url, title=title)
+                cassette.crawl_delay()
+                try:
+                    s = Schedule(url, title=title)
+                except requests.RequestException as e:
+                    config.LOGGER.error(f'Could not fetch a schedule: {e}')
+                    config.LOGGER.error(f'- Title: {title}')
+                    config.LOGGER.error(f'- URL:   {url}')
+                    continue
                 s.parse()
 
         if self.is_url:
@@ -1,14 +1,15 @@
-from datetime import timedelta
-from typing import Dict
+from datetime import datetime, timedelta
+from typing import Dict, List, Union
 
-import pendulum
 import requests
 import yaml
 
 import config
+import timestamps
 
 
-NEXT = config.NOW + timedelta(minutes=30)
+NOW = timestamps.to_epoch(config.NOW)
+NEXT = timestamps.to_epoch(config.NOW + timedelta(minutes=30))
 
 MESSAGE = """
 Time: **{0}** (less than 30 minutes)
@@ -16,6 +17,9 @@ Time: **{0}** (less than 30 minutes)
 ᴿᵉᵃᵈ ᵗʰᵉ [ˢᶜʰᵉᵈᵘˡᵉ]({1})
 """
 
+# Discord accepts at most 10 embeds per message.
+MAX_EMBEDS = 10
+
 with open('webhook.yaml', 'r') as f:
     CONF = yaml.safe_load(f)
     ID = CONF['ID']
@@ -23,72 +27,216 @@ with open('webhook.yaml', 'r') as f:
         LAST = CONF['LAST']
     except KeyError:
         LAST = None
+    try:
+        SUBSCRIBERS = CONF['SUBSCRIBERS'] or []
+    except KeyError:
+        SUBSCRIBERS = []
 
 
-def execute_webhook(dt: pendulum.datetime, uq: str, title: str) -> None:
-    """Execute webhook given a UQ's name, datetime, and title of the
-    event page it belongs.
+def get_destinations() -> List[Dict[str, Union[str, None]]]:
+    """Get every webhook to notify. `ID` uses the schedule's timezone;
+    each of `SUBSCRIBERS` may set its own `TIMEZONE`.
 
-    Args:
-        dt (pendulum.datetime): the datetime of the UQ
-        uq (str): name of the UQ
-        title (str): title of the page that had the UQ on schedule
+    Returns:
+        List[Dict[str, Union[str, None]]]: destinations, each with
+            an "ID", a "TIMEZONE" (None for the schedule's timezone),
+            and a "NAME" for logging, as IDs contain webhook tokens
 
     """
-    payload = {
-        "embeds": [
+    destinations = []
+    if ID:
+        destinations.append({'ID': ID, 'TIMEZONE': None, 'NAME': 'ID'})
+    for n, subscriber in enumerate(SUBSCRIBERS):
+        try:
+            destinations.append(
+                {
+                    'ID': subscriber['ID'],
+                    'TIMEZONE': subscriber.get('TIMEZONE'),
+                    'NAME': f'SUBSCRIBERS[{n}]',
+                    }
+                )
+        except (KeyError, TypeError, AttributeError):
+            config.LOGGER.warning(
+                f'Skipped malformed subscriber: SUBSCRIBERS[{n}]'
+                )
+    return destinations
+
+
+class Notifications:
+    """Collects every event in the window, then sends them together:
+    one message per destination instead of one per event.
+
+    """
+
+    def __init__(
+        self, destinations: List[Dict[str, Union[str, None]]]
+        ) -> None:
+        """Initialize an empty batch of notifications.
+
+        Args:
+            destinations (List[Dict[str, Union[str, None]]]): webhooks
+                to notify; see `get_destinations()`
+
+        """
+        self.destinations = destinations
+        # (epoch, dt_str, uq, url)
+        self.events = []
+        # (epoch, timezone): rendered time
+        self.renders = {}
+
+    def add(self, epoch: int, dt_str: str, uq: str, url: str) -> None:
+        """Add an event to the batch.
+
+        Args:
+            epoch (int): the event's time in seconds since the epoch
+            dt_str (str): the event's datetime string
+            uq (str): name of the UQ
+            url (str): the page that had the UQ on schedule
+
+        """
+        self.events.append((epoch, dt_str, uq, url))
+
+    def render(self) -> None:
+        """Render every event's time once per timezone in use."""
+        zones = {destination['TIMEZONE'] for destination in self.destinations}
+        for zone in zones:
+            try:
+                tz = timestamps.get_zone(zone) if zone else None
+            except ValueError as e:
+                config.LOGGER.warning(f'{e}; using the schedule\'s timezone.')
+                tz = None
+            for epoch, dt_str, _, _ in self.events:
+                if tz is None:
+                    dt = timestamps.to_datetime(epoch, dt_str)
+                    rendered = timestamps.to_day_datetime_string(dt)
+                else:
+                    dt = datetime.fromtimestamp(epoch, tz)
+                    rendered = (
+                        f'{timestamps.to_day_datetime_string(dt)} '
+                        f'{dt.tzname()}'
+                        )
+                self.renders[(epoch, zone)] = rendered
+
+    def get_payloads(self, zone: Union[str, None]) -> List[Dict]:
+        """Build the messages for one timezone.
+
+        Args:
+            zone (Union[str, None]): a timezone name, or None for the
+                schedule's timezone
+
+        Returns:
+            List[Dict]: payloads, each with up to `MAX_EMBEDS` events
+
+        """
+        embeds = [
             {
                 "title": f"**{uq}**",
                 "description": MESSAGE.format(
-                    dt.to_day_datetime_string(),
-                    title,
-                    )
+                    self.renders[(epoch, zone)], url
+                    ),
                 }
+            # Earliest event first
+            for epoch, dt_str, uq, url in sorted(self.events)
             ]
-        }
-    response = requests.post(ID, json=payload)
-    out = {
-        'ID': ID,
-        'LAST': str(dt),
-        }
-    with open('webhook.yaml', 'w') as f:
-        yaml.safe_dump(out, stream=f)
+        return [
+            {"embeds": embeds[i:i + MAX_EMBEDS]}
+            for i in range(0, len(embeds), MAX_EMBEDS)
+            ]
+
+    def send(self) -> None:
+        """Send the batch to every destination. A destination that
+        fails is logged and does not stop the rest.
+
+        """
+        self.render()
+        payloads = {}
+        for destination in self.destinations:
+            zone = destination['TIMEZONE']
+            if zone not in payloads:
+                payloads[zone] = self.get_payloads(zone)
+            try:
+                for payload in payloads[zone]:
+                    execute_webhook(destination['ID'], payload)
+            except requests.RequestException as e:
+                # The exception's message may include the webhook URL.
+                status = (
+                    e.response.status_code
+                    if e.response is not None else None
+                    )
+                config.LOGGER.error(
+                    f'Could not execute webhook {destination["NAME"]}: '
+                    f'{type(e).__name__} (status: {status})'
+                    )
+        for epoch, dt_str, uq, url in sorted(self.events):
+            config.LOGGER.info(f'UQ: {uq}, DT: {dt_str}')
+
 
+def execute_webhook(url: str, payload: Dict) -> None:
+    """Execute a webhook with a prepared payload.
+
+    Args:
+        url (str): the webhook URL to POST
+        payload (Dict): the message; see `Notifications.get_payloads()`
+
+    Raises:
+        requests.HTTPError: if the webhook returned an error, e.g. it
+            was deleted or is being rate limited
+
+    """
+    response = requests.post(url, json=payload)
+    response.raise_for_status()
     config.LOGGER.info(f'Executed webhook @ {config.NOW}: {response}')
-    config.LOGGER.info(f'UQ: {uq}, DT: {dt}')
 
 
+def write_last(dt_str: str) -> None:
+    """Record the latest event notified, keeping the rest of the
+    configuration.
+
+    Args:
+        dt_str (str): the event's datetime string
+
+    """
+    out = dict(CONF)
+    out['LAST'] = dt_str
+    with open('webhook.yaml', 'w') as f:
+        yaml.safe_dump(out, stream=f)
+
 
 def search_events() -> None:
-    """Search events by going through the database, finding one that
+    """Search events by going through the database, finding all that
     will happen between now (to be run at :00 and :30) and 30 minutes
-    later.
+    later, and notify every destination once.
 
     """
+    index = None
     if LAST:
-        dt_strs = [dt_str for dt_str, uq, title, url in config.RESULTS]
-        index = dt_strs.index(LAST)
-        # dt_str, uq, title, url = config.RESULTS[index - 1]
-        # dt = pendulum.parse(dt_str)
-        # if config.NOW <= dt <= NEXT:
-        #     execute_webhook(dt, uq, url)
-        #     return
-    else:
-        index = None
-    for dt_str, uq, title, url in config.RESULTS[:index]:
-        dt = pendulum.parse(dt_str)
+        dt_strs = [dt_str for dt_str, uq, title, url, epoch in config.RESULTS]
+        try:
+            index = dt_strs.index(LAST)
+        except ValueError:
+            config.LOGGER.warning(f'{LAST} (LAST) was not found in the DB.')
+    notifications = Notifications(get_destinations())
+    for dt_str, uq, title, url, epoch in config.RESULTS[:index]:
         # In reverse chronological order, some events may be ahead.
         # Those events should be ignored.
-        if dt > NEXT:
+        if epoch > NEXT:
             continue
-        # Likewise, some events will be behind. If an event hasn't
-        # been found in range (they cannot have collisions),
-        # stop looking.
-        elif dt < config.NOW:
-            return
+        # Likewise, some events will be behind. Once an event is
+        # behind, every event after it is too; stop looking.
+        elif epoch < NOW:
+            break
         else:
-            execute_webhook(dt, uq, url)
-            return
+            notifications.add(epoch, dt_str, uq, url)
+
+    if not notifications.events:
+        return
+    try:
+        notifications.send()
+    finally:
+        # Written even if a destination failed, so destinations that
+        # were notified aren't notified again on the next run.
+        # Events are newest first, so the first event is the latest.
+        write_last(notifications.events[0][1])
 
 
 if __name__ == '__main__':